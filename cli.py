@@ -1,55 +1,54 @@
 # cli.py
+import sys
+
 from sql_engine import SimpleSQLEngine
 
-def format_results(results: list):
-    """Prints the list of dictionaries as a neatly formatted table."""
-    if not results:
+def format_results(results):
+    """Prints a query result as a neatly formatted table.
+    Accepts the engine's columnar result or a list of dictionaries.
+    """
+    if isinstance(results, dict):
+        columns = results['columns']
+        col_values = [results['data'][col] for col in columns]
+        nrows = results['nrows']
+    else:
+        # Get all column names (keys) from all rows
+        all_keys = set()
+        for row in results:
+            all_keys.update(row.keys())
+        columns = list(all_keys)
+        col_values = [[row.get(col, '') for row in results] for col in columns]
+        nrows = len(results)
+
+    if not nrows:
         print("  (0 rows returned)")
         return
 
-    # Get all column names (keys) from all rows
-    all_keys = set()
-    for row in results:
-        all_keys.update(row.keys())
-    
-    columns = list(all_keys)
-    
-    # Calculate column widths
-    col_widths = {col: len(col) for col in columns}
-    for row in results:
-        for col in columns:
-            val_str = str(row.get(col, ''))
-            col_widths[col] = max(col_widths[col], len(val_str))
+    # Stringify every cell exactly once; widths and rows both reuse these strings
+    str_values = [list(map(str, values)) for values in col_values]
+    col_widths = {col: max(len(col), max(map(len, strs))) for col, strs in zip(columns, str_values)}
 
-    # --- Print Header ---
-    header_line = ""
-    separator_line = ""
-    for col in columns:
-        width = col_widths[col]
-        header_line += f"| {col.upper():<{width}} "
-        separator_line += f"+{'-' * (width + 2)}"
-        
-    print(separator_line + "+")
-    print(header_line + "|")
-    print(separator_line + "+")
+    # Right-align columns that hold only numbers (and blanks)
+    is_numeric = {
+        col: all(isinstance(value, (int, float)) for value in values if value != '')
+        for col, values in zip(columns, col_values)
+    }
 
-    # --- Print Rows ---
-    for row in results:
-        row_line = ""
-        for col in columns:
-            width = col_widths[col]
-            value = row.get(col, '')
-            val_str = str(value)
-            
-            if isinstance(value, (int, float)):
-                 row_line += f"| {val_str:>{width}} " # Right-align numbers
-            else:
-                 row_line += f"| {val_str:<{width}} " # Left-align everything else
-                 
-        print(row_line + "|")
-        
-    print(separator_line + "+")
-    print(f"({len(results)} rows returned)")
+    # One format string per row: numbers right-aligned, everything else left-aligned
+    row_format = ''.join(
+        f"| {{:>{col_widths[col]}}} " if is_numeric[col] else f"| {{:<{col_widths[col]}}} "
+        for col in columns
+    ) + "|"
+    header_line = ''.join(f"| {col.upper():<{col_widths[col]}} " for col in columns) + "|"
+    separator_line = ''.join(f"+{'-' * (col_widths[col] + 2)}" for col in columns) + "+"
+
+    # Build the whole table, then write it in a single call
+    lines = [separator_line, header_line, separator_line]
+    lines.extend(map(row_format.format, *str_values))
+    lines.append(separator_line)
+    lines.append(f"({nrows} rows returned)")
+
+    sys.stdout.write('\n'.join(lines) + '\n')
 
 
 def main():
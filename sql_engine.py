@@ -1,5 +1,181 @@
 import csv
+import io
+import mmap
+import operator
+import os
 import re 
+import sys
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import compress, islice, repeat
+
+# Comparison operators supported in WHERE; each maps to its C-implemented function
+_OPS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '>': operator.gt,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '<=': operator.le,
+}
+
+# SQL tokens, matched left to right in a single pass by _tokenize
+_TOKEN_RE = re.compile(r"""\s*(?:
+    (?P<str>'[^']*'|"[^"]*")
+    |(?P<num>-?\d+(?:\.\d+)?)(?!\w)
+    |(?P<op>>=|<=|!=|=|>|<)
+    |(?P<id>\w+)
+    |(?P<punc>[(),*;])
+)""", re.VERBOSE)
+_END_TOKEN = ('end', '')
+
+# Count kernels for range conditions over a sorted copy of a numeric column
+_SORTED_COUNTS = {
+    '>': lambda values, target: len(values) - bisect_right(values, target),
+    '>=': lambda values, target: len(values) - bisect_left(values, target),
+    '<': bisect_left,
+    '<=': bisect_right,
+}
+
+# Rough fraction of rows each operator keeps; AND chains run the most selective first
+_SELECTIVITY = {'=': 0.01, '>': 0.3, '<': 0.3, '>=': 0.3, '<=': 0.3, '!=': 0.9}
+
+# CSV rows transposed into columns per batch in load_csv
+_LOAD_CHUNK_ROWS = 1 << 16
+# Read buffer for CSV files (1 MiB instead of the 8 KiB default)
+_CSV_BUFFER_SIZE = 1 << 20
+# Files at least this large are parsed by a pool of worker processes
+_PARALLEL_LOAD_MIN_BYTES = 64 << 20
+
+def _tokenize(sql_query: str) -> tuple:
+    """
+    Splits a SQL string into a tuple of (kind, text) tokens in one pass.
+    Keywords are lexed as plain words and keep their original text, so columns and
+    tables may be named e.g. 'count'; the parser matches them with _is_keyword.
+    """
+    tokens = []
+    pos = 0
+    while True:
+        match = _TOKEN_RE.match(sql_query, pos)
+        if not match:
+            rest = sql_query[pos:].strip()
+            if rest:
+                raise Exception(f"Syntax Error: Unexpected character '{rest[0]}'.")
+            return tuple(tokens)
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+
+
+def _token_at(tokens: tuple, pos: int) -> tuple:
+    """Returns the token at pos, or an 'end' token past the end of the query."""
+    return tokens[pos] if pos < len(tokens) else _END_TOKEN
+
+
+def _is_keyword(token: tuple, keyword: str) -> bool:
+    """Checks whether a token is the given (uppercase) keyword, in any case."""
+    return token[0] == 'id' and token[1].upper() == keyword
+
+
+def result_to_rows(result: dict) -> list:
+    """Converts a columnar query result into a list of row dictionaries."""
+    columns = result['columns']
+    return [dict(zip(columns, row)) for row in zip(*(result['data'][col] for col in columns))]
+
+
+def _copy_result(result: dict) -> dict:
+    """Copies a columnar result so callers can modify it without touching the cached one."""
+    return {
+        'columns': list(result['columns']),
+        'data': {col: list(values) for col, values in result['data'].items()},
+        'nrows': result['nrows'],
+    }
+
+
+def _count_result(count: int) -> dict:
+    """Wraps a COUNT value in the columnar result shape."""
+    return {'columns': ['COUNT'], 'data': {'COUNT': [count]}, 'nrows': 1}
+
+
+def _append_csv_rows(reader, raw_values: list):
+    """Appends the rows of a csv.reader to per-column value lists, transposing
+    a chunk of rows at a time. Blank lines are skipped, short rows are padded
+    with '' and extra fields are dropped.
+    """
+    ncols = len(raw_values)
+    while ncols:
+        chunk = list(islice(reader, _LOAD_CHUNK_ROWS))
+        if not chunk:
+            break
+        if set(map(len, chunk)) != {ncols}:
+            chunk = [(row + [''] * ncols)[:ncols] for row in chunk if row]
+        for values, chunk_values in zip(raw_values, zip(*chunk)):
+            values.extend(chunk_values)
+
+
+def _find_record_end(data, start: int, pos: int):
+    """Returns the index of the first newline at or after `pos` that ends a CSV record,
+    given that a record starts at `start`, or -1 if there is none.
+
+    Quotes are tracked the way the csv module reads them: a quote opens a field only
+    at the start of a field, and inside it a doubled quote is literal while a single
+    one closes it. Returns None if a quote sits anywhere else (e.g. `5" screen`),
+    since the csv module would then read it literally and the caller should parse
+    serially instead.
+    """
+    scanned = start
+    while True:
+        newline = data.find(b'\n', max(pos, scanned))
+        if newline == -1:
+            return -1
+        quote = data.find(b'"', scanned, newline)
+        if quote == -1:
+            return newline
+        if quote != start and data[quote - 1] not in b',\r\n':
+            return None
+        close = quote + 1
+        while True:
+            close = data.find(b'"', close)
+            if close == -1:
+                return None
+            if data[close + 1:close + 2] != b'"':
+                break
+            close += 2
+        if data[close + 1:close + 2] not in (b'', b',', b'\r', b'\n'):
+            return None
+        scanned = close + 1
+
+
+def _split_csv_ranges(data, start: int, parts: int):
+    """Splits data[start:] into up to `parts` byte ranges that each end on a record
+    boundary, or returns None if the quoting can't be followed (see _find_record_end).
+    """
+    bounds = [start]
+    for i in range(1, parts):
+        target = start + (len(data) - start) * i // parts
+        if target < bounds[-1]:
+            continue
+        newline = _find_record_end(data, bounds[-1], target)
+        if newline is None:
+            return None
+        if newline == -1:
+            break
+        bounds.append(newline + 1)
+    bounds.append(len(data))
+    return [(lo, hi) for lo, hi in zip(bounds, bounds[1:]) if lo < hi]
+
+
+def _parse_csv_range(filename: str, start: int, end: int, ncols: int) -> list:
+    """Worker for parallel loads: parses bytes [start, end) of a CSV file into per-column value lists."""
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8')
+    raw_values = [[] for _ in range(ncols)]
+    _append_csv_rows(csv.reader(io.StringIO(text, newline='')), raw_values)
+    return raw_values
+
 
 class SimpleSQLEngine:
     """
@@ -8,8 +184,18 @@ class SimpleSQLEngine:
     and aggregation (COUNT). Table and column lookups are case-insensitive.
     """
     def __init__(self):
-        # self.table_data stores: { 'table_name': { 'columns': [...], 'rows': [{...}, {...}] } }
+        # self.table_data stores: { 'table_name': { 'columns': [...], 'rows': {'col': [...]}, 'nrows': n } }
+        # Rows are kept column-wise: one list of values per column, all of length nrows.
         self.table_data = {}
+        # Prepared statements: query tokens -> executor closure (see _compile_query)
+        self._compile = lru_cache(maxsize=128)(self._compile_query)
+        # Result cache: query tokens -> (table_name, table_version, result), in LRU order
+        self._table_version = {}
+        self._result_cache = OrderedDict()
+        self._result_cache_size = 64
+        # Cached results copy table data, so their cells (rows x columns) are capped in total
+        self._result_cache_max_cells = 1 << 20
+        self._result_cache_cells = 0
 
     def load_csv(self, filename: str, table_name: str):
         """
@@ -23,272 +209,534 @@ class SimpleSQLEngine:
         normalized_table_name = table_name.lower()
         
         try:
-            with open(filename, 'r', newline='') as f:
-                reader = csv.DictReader(f)
-                rows = list(reader)
-                
-                if not rows:
-                    raise Exception(f"Error: CSV file '{filename}' is empty or has no data rows.")
-                
-                # 2. Normalize column headers (keys) to lowercase
-                columns = [col.lower() for col in reader.fieldnames]
-
-                # 3. Normalize row keys to lowercase and prepare for type casting/cleaning
-                normalized_rows = [{k.lower(): v for k, v in row.items()} for row in rows]
-                
-                self.table_data[normalized_table_name] = {
-                    'columns': columns, 
-                    'rows': self._cast_data_types(normalized_rows)
-                }
-            print(f"✅ Loaded '{filename}' as table '{normalized_table_name}' with {len(rows)} rows.")
+            # 2. Read the header and one list of values per column (columnar layout);
+            #    large files are split across worker processes when that is safe
+            loaded = None
+            if os.path.getsize(filename) >= _PARALLEL_LOAD_MIN_BYTES:
+                loaded = self._read_csv_parallel(filename)
+            if loaded is None:
+                loaded = self._read_csv(filename)
+            columns, raw_values = loaded
+
+            nrows = len(raw_values[0]) if raw_values else 0
+            if not nrows:
+                raise Exception(f"Error: CSV file '{filename}' is empty or has no data rows.")
+
+            raw_columns = dict(zip(columns, raw_values))
+            
+            casted_columns, column_types = self._cast_data_types(raw_columns)
+
+            # 3. Pre-lowercase and intern string columns once, so case-insensitive
+            #    equality compares shared string objects (and repeats cost no memory)
+            lowered_columns = {
+                col: list(map(sys.intern, map(str.lower, values)))
+                for col, values in casted_columns.items() if column_types[col] is str
+            }
+            
+            self.table_data[normalized_table_name] = {
+                'columns': columns, 
+                'rows': casted_columns,
+                'rows_lc': lowered_columns,
+                'types': column_types,
+                'has_nulls': {col: '' in values or None in values
+                              for col, values in casted_columns.items()},
+                # Hash indexes on WHERE columns, built lazily by _compile_predicate
+                'indexes': {},
+                # Sorted copies of numeric columns for range counts, built lazily
+                'sorted': {},
+                'nrows': nrows
+            }
+            # Compiled queries capture table data, so drop them on every (re)load
+            self._compile.cache_clear()
+
+            # Bump the table version and forget results computed from the old data
+            self._table_version[normalized_table_name] = self._table_version.get(normalized_table_name, 0) + 1
+            for key in [k for k, entry in self._result_cache.items() if entry[0] == normalized_table_name]:
+                self._drop_cached_result(key)
+            print(f"✅ Loaded '{filename}' as table '{normalized_table_name}' with {nrows} rows.")
             
         except FileNotFoundError:
             raise Exception(f"Error: File not found: {filename}")
         except Exception as e:
             raise Exception(f"Error loading CSV: {e}")
 
-    def _cast_data_types(self, rows: list) -> list:
+    def _read_csv(self, filename: str) -> tuple:
+        """Reads a CSV file in this process and returns (lowercased columns, per-column value lists)."""
+        with open(filename, 'r', newline='', buffering=_CSV_BUFFER_SIZE, encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next((row for row in reader if row), None)
+            
+            # Normalize column headers to lowercase, once
+            columns = [col.lower() for col in header] if header else []
+            raw_values = [[] for _ in columns]
+            _append_csv_rows(reader, raw_values)
+        return columns, raw_values
+
+    def _read_csv_parallel(self, filename: str):
+        """
+        Reads a large CSV file by splitting it into byte ranges at record boundaries
+        and parsing each range in a worker process. Returns (columns, per-column value
+        lists), or None when the file should be read serially instead (single CPU,
+        a header that is blank or spans lines, or quoting the splitter can't follow).
+        """
+        workers = os.cpu_count() or 1
+        if workers < 2:
+            return None
+
+        with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            header_end = _find_record_end(data, 0, 0)
+            if header_end is None or data[:header_end + 1].count(b'\n') > 1:
+                return None
+            header_end = header_end + 1 if header_end != -1 else len(data)
+            header = next(csv.reader([data[:header_end].decode('utf-8')]), None)
+            if not header:
+                return None
+            ranges = _split_csv_ranges(data, header_end, workers)
+            if ranges is None:
+                return None
+
+        columns = [col.lower() for col in header]
+        raw_values = [[] for _ in columns]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_parse_csv_range, filename, start, end, len(columns)) for start, end in ranges]
+            for future in futures:
+                for values, part_values in zip(raw_values, future.result()):
+                    values.extend(part_values)
+        return columns, raw_values
+
+    def _cast_data_types(self, columns: dict) -> tuple:
         """
         Helper to try and convert string data to numbers and strip whitespace
         from remaining strings for accurate comparison.
+        Works column by column and returns ({ 'column': [values...] }, { 'column': int|float|str }).
         """
-        if not rows:
-            return []
-        
-        sample_rows = rows[:min(10, len(rows))]
-        numeric_cols = {}
+        casted_columns = {}
+        column_types = {}
         
-        # Identify numeric columns
-        for col in rows[0].keys():
-            is_int = True
-            is_float = True
-            for row in sample_rows:
-                value = row.get(col, '')
-                if value == '': 
-                    continue
-                try:
-                    int(value)
-                except ValueError:
-                    is_int = False
-                try:
-                    float(value)
-                except ValueError:
-                    is_float = False
+        for col, values in columns.items():
+            # Try int, then float, on the whole column at once (map() runs the
+            # conversion in C); blanks stay '' and only they need a per-value check.
+            # Anything that does not convert, or a column of blanks, stays strings.
+            has_blanks = '' in values
+            column_types[col] = str
             
-            if is_int and not is_float:
-                 numeric_cols[col] = int
-            elif is_float:
-                numeric_cols[col] = float
-        
-        # Apply type casting and string cleaning (stripping whitespace)
-        casted_rows = []
-        for row in rows:
-            new_row = {}
-            for col, value in row.items():
-                if col in numeric_cols and value != '':
-                    new_row[col] = numeric_cols[col](value)
-                else:
-                    # Strip whitespace from string values
-                    new_row[col] = value.strip() if isinstance(value, str) else value 
-                    
-            casted_rows.append(new_row)
+            if not has_blanks or any(values):
+                for cast in (int, float):
+                    try:
+                        if has_blanks:
+                            casted_columns[col] = [cast(value) if value else value for value in values]
+                        else:
+                            casted_columns[col] = list(map(cast, values))
+                    except ValueError:
+                        continue
+                    column_types[col] = cast
+                    break
+
+            # Strip whitespace from string values
+            if column_types[col] is str:
+                casted_columns[col] = list(map(str.strip, values))
             
-        return casted_rows
+        return casted_columns, column_types
 
     def parse_query(self, sql_query: str) -> dict:
         """
         Parses a simplified SQL query string into a structured dictionary.
         Normalizes table and column names to lowercase.
         """
-        sql_query = ' '.join(sql_query.strip().split())
-        upper_query = sql_query.upper()
-        
-        # 1. Extract FROM and Table Name
-        if 'FROM' not in upper_query:
+        return self._parse_tokens(_tokenize(sql_query))
+
+    def _parse_tokens(self, tokens: tuple) -> dict:
+        """
+        Recursive-descent parser over the token tuple from _tokenize:
+            SELECT select_list FROM table [WHERE condition {AND condition}]
+        """
+        if not any(_is_keyword(token, 'FROM') for token in tokens):
             raise Exception("Syntax Error: Missing FROM clause.")
+        if not _is_keyword(_token_at(tokens, 0), 'SELECT'):
+            raise Exception("Syntax Error: Missing SELECT keyword.")
 
-        from_parts = upper_query.split('FROM', 1)
-        select_clause = from_parts[0].replace('SELECT', '', 1).strip()
-        
-        remaining_query = from_parts[1].strip()
+        # 1. SELECT Columns/Function
+        select_cols, is_aggregate, pos = self._parse_select_list(tokens, 1)
         
-        if 'WHERE' in remaining_query:
-            table_name_raw = remaining_query.split('WHERE', 1)[0].strip()
-            where_clause_str = remaining_query.split('WHERE', 1)[1].strip()
-        else:
-            table_name_raw = remaining_query.strip()
-            where_clause_str = None
-        
-        if not table_name_raw or table_name_raw.split()[0].upper() in ('WHERE', 'GROUP', 'ORDER'):
+        kind, text = _token_at(tokens, pos)
+        if not _is_keyword((kind, text), 'FROM'):
+            raise Exception(f"Syntax Error: Unexpected '{text}' in SELECT clause.")
+
+        # 2. FROM and Table Name
+        kind, text = _token_at(tokens, pos + 1)
+        if kind != 'id':
             raise Exception("Syntax Error: Missing or invalid table name after FROM.")
         
-        table_name = table_name_raw.split()[0].lower()
+        table_name = text.lower()
+        pos += 2
         
         if table_name not in self.table_data:
             raise Exception(f"Query Error: Table '{table_name}' has not been loaded.")
             
         parsed_query = {
             'table': table_name,
-            'select_cols': None,
+            'select_cols': select_cols,
             'where': None,
-            'is_aggregate': False
+            'is_aggregate': is_aggregate
         }
+            
+        # 3. WHERE clause: one or more conditions joined by AND
+        if _is_keyword(_token_at(tokens, pos), 'WHERE'):
+            condition, pos = self._parse_condition(tokens, pos + 1, table_name)
+            parsed_query['where'] = [condition]
+            while _is_keyword(_token_at(tokens, pos), 'AND'):
+                condition, pos = self._parse_condition(tokens, pos + 1, table_name)
+                parsed_query['where'].append(condition)
+
+        # An optional trailing semicolon ends the statement
+        if _token_at(tokens, pos) == ('punc', ';'):
+            pos += 1
+        if pos < len(tokens):
+            raise Exception(f"Syntax Error: Unexpected '{tokens[pos][1]}' in query.")
+
+        return parsed_query # The function must return the parsed dictionary!
 
-        # 2. Extract SELECT Columns/Function
-        if not select_clause:
+    def _parse_select_list(self, tokens: tuple, pos: int) -> tuple:
+        """Parses 'COUNT(*|column)', '*' or 'column, ...' and returns (select_cols, is_aggregate, next_pos)."""
+        kind, text = _token_at(tokens, pos)
+        
+        if _is_keyword((kind, text), 'FROM') or (kind, text) == _END_TOKEN:
             raise Exception("Syntax Error: Missing columns/function in SELECT clause.")
+
+        # COUNT is the aggregate only when called; otherwise it is a column name
+        if _is_keyword((kind, text), 'COUNT') and _token_at(tokens, pos + 1) == ('punc', '('):
+            target_kind, target = _token_at(tokens, pos + 2)
+            if (_token_at(tokens, pos + 3) != ('punc', ')')
+                    or (target_kind, target) != ('punc', '*') and target_kind != 'id'):
+                raise Exception("Syntax Error: Invalid COUNT() expression.")
+            return {'func': 'COUNT', 'target': target.lower()}, True, pos + 4
+
+        if (kind, text) == ('punc', '*'):
+            return ['*'], False, pos + 1
+
+        # Normalize selected columns to lowercase
+        select_cols = []
+        while True:
+            kind, text = _token_at(tokens, pos)
+            if kind != 'id':
+                raise Exception(f"Syntax Error: Invalid column '{text}' in SELECT clause.")
+            select_cols.append(text.lower())
+            if _token_at(tokens, pos + 1) != ('punc', ','):
+                return select_cols, False, pos + 1
+            pos += 2
+
+    def _parse_condition(self, tokens: tuple, pos: int, table_name: str) -> tuple:
+        """Parses a single 'column <op> value' WHERE condition and returns (predicate, next_pos)."""
+        (col_kind, col), (op_kind, op), (value_kind, value) = (_token_at(tokens, pos + i) for i in range(3))
+        
+        if col_kind != 'id' or op_kind != 'op' or value_kind not in ('str', 'num', 'id'):
+            raise Exception("Syntax Error: Invalid WHERE clause format.")
         
-        if select_clause.startswith('COUNT(') and select_clause.endswith(')'):
-            col_or_star = select_clause[6:-1].strip().lower() 
-            parsed_query['is_aggregate'] = True
-            parsed_query['select_cols'] = {'func': 'COUNT', 'target': col_or_star}
+        # Normalize WHERE column name to lowercase
+        col = col.lower() 
+        
+        # Quoted literals lose their quotes; numbers become int/float; bare words stay strings
+        if value_kind == 'str':
+            value = value[1:-1]
+        elif value_kind == 'num':
+            value = float(value) if '.' in value else int(value)
+
+        if col not in self.table_data[table_name]['columns']:
+            raise Exception(f"Query Error: Column '{col}' in WHERE clause does not exist.")
+
+        return {
+            'column': col, 
+            'operator': op,
+            'value': value
+        }, pos + 3
+
+    def _bind_condition(self, where_clause: dict):
+        """
+        Returns a one-argument test that evaluates a single WHERE condition against a
+        single column value, using case-insensitive comparison for strings (equality ops).
+        The operator function, the literal and its type are resolved once up front
+        rather than for every row; a string literal for a numeric column is expected
+        to already be converted to the column type (see _compile_predicate).
+        """
+        op = where_clause['operator']
+        target_val = where_clause['value']
+
+        compare = _OPS.get(op)
+        if compare is None:
+            raise Exception(f"Unsupported operator: {op}")
+
+        # Result for null/empty values
+        if op == '=':
+            null_result = target_val is None or target_val == ''
+        elif op == '!=':
+            null_result = target_val is not None and target_val != ''
         else:
-            # Normalize selected columns to lowercase
-            parsed_query['select_cols'] = [c.strip().lower() for c in select_clause.split(',')]
-            
-        # 3. Extract WHERE clause (The originally incomplete part)
-        if where_clause_str:
-            match = re.search(r"(\w+)\s*(>=|<=|!=|=|>|<)\s*([\"']?[^\s\"']+[^\)]*[\"']?)$", where_clause_str, re.IGNORECASE)
-            
-            if not match:
-                raise Exception("Syntax Error: Invalid WHERE clause format.")
+            null_result = False
 
-            col, op, raw_val = match.groups()
-            
-            # Normalize WHERE column name to lowercase
-            col = col.lower() 
-            
-            # Clean up the value (remove surrounding quotes)
-            value = raw_val.strip()
-            if value.startswith(("'", '"')) and value.endswith(("'", '"')):
-                value = value[1:-1]
-            
-            # Convert value to number if possible
-            try:
-                if re.match(r'^\d+$', value):
-                    value = int(value)
-                elif re.match(r'^\d+\.\d+$', value):
-                    value = float(value)
-            except ValueError:
-                pass 
+        if isinstance(target_val, (int, float)):
+            # Numeric literal: numbers compare as they are; strings are converted
+            # to the literal's type where possible
+            cast = type(target_val)
 
-            parsed_query['where'] = {
-                'column': col, 
-                'operator': op,
-                'value': value
-            }
+            def test(row_val):
+                if row_val is None or row_val == '':
+                    return null_result
+                if not isinstance(row_val, (int, float)):
+                    try:
+                        row_val = cast(row_val)
+                    except (TypeError, ValueError):
+                        pass
+                return compare(row_val, target_val)
+        else:
+            # String literal: strings compare case-insensitively for equality ops. Numeric
+            # columns have their literal converted by the caller (_compile_predicate)
+            fold_case = op in ('=', '!=') and isinstance(target_val, str)
+            lowered_target = target_val.lower() if fold_case else target_val
 
-            if col not in self.table_data[table_name]['columns']:
-                raise Exception(f"Query Error: Column '{col}' in WHERE clause does not exist.")
+            def test(row_val):
+                if row_val is None or row_val == '':
+                    return null_result
+                if fold_case and isinstance(row_val, str):
+                    return compare(row_val.lower(), lowered_target)
+                return compare(row_val, target_val)
 
-        return parsed_query # The function must return the parsed dictionary!
+        return test
 
-    def _evaluate_condition(self, row: dict, where_clause: dict) -> bool:
-        """Evaluates a single WHERE condition against a single row, 
-        using case-insensitive comparison for strings (equality ops).
+    def _build_index(self, col_values: list) -> dict:
+        """Builds a hash index { value: [row indices in ascending order] } for one column."""
+        index = {}
+        for i, value in enumerate(col_values):
+            rows = index.get(value)
+            if rows is None:
+                index[value] = [i]
+            else:
+                rows.append(i)
+        return index
+
+    def _compile_predicate(self, table: dict, where_clause: dict, use_index: bool = True) -> tuple:
+        """Specializes one WHERE condition to the column it filters and returns
+        (build_mask, refine, row_ids, count):
+          - build_mask() produces an iterator of booleans, one per row;
+          - refine(row_indices) keeps only the given rows that match;
+          - row_ids() returns the list of matching row indices when a hash index on
+            the column answers the condition and use_index is set, else row_ids is None;
+          - count() returns the number of matching rows in the whole table.
+        Comparisons run over the column at once; rows are only checked one by one
+        (via a test from _bind_condition) when the column mixes types or nulls.
         """
         col = where_clause['column']
         op = where_clause['operator']
         target_val = where_clause['value']
+        col_values = table['rows'][col]
+        col_type = table['types'][col]
 
-        row_val = row.get(col)
+        # Nulls only behave like ordinary values under =/!=
+        is_simple = op in ('=', '!=') or not table['has_nulls'][col]
         
-        # Handle null/empty values
-        if row_val is None or row_val == '':
-            if op == '=':
-                return target_val is None or target_val == ''
-            elif op == '!=':
-                return target_val is not None and target_val != ''
-            return False 
-
-        # Handle type mismatch
-        try:
-            if isinstance(target_val, (int, float)):
-                row_val = type(target_val)(row_val) 
-            elif isinstance(row_val, (int, float)) and isinstance(target_val, str):
-                 target_val = type(row_val)(target_val)
-        except (TypeError, ValueError):
-            pass 
-
-        # Perform the comparison (using .lower() for string equality)
-        if op == '=':
-            if isinstance(row_val, str) and isinstance(target_val, str):
-                return row_val.lower() == target_val.lower()
-            return row_val == target_val
-        elif op == '!=':
-            if isinstance(row_val, str) and isinstance(target_val, str):
-                return row_val.lower() != target_val.lower()
-            return row_val != target_val
-        elif op == '>':
-            return row_val > target_val
-        elif op == '<':
-            return row_val < target_val
-        elif op == '>=':
-            return row_val >= target_val
-        elif op == '<=':
-            return row_val <= target_val
+        # Coerce the literal to the column type once, not once per row
+        if col_type is not str and isinstance(target_val, str):
+            try:
+                target_val = col_type(target_val)
+            except ValueError:
+                pass
+
+        if is_simple and col_type is str and isinstance(target_val, str):
+            if op in ('=', '!='):
+                col_values = table['rows_lc'][col]
+                target_val = sys.intern(target_val.lower())
+        elif not (is_simple and col_type is not str):
+            is_simple = False
+
+        if is_simple:
+            compare = _OPS[op]
+
+            def build_mask():
+                return map(compare, col_values, repeat(target_val))
+
+            def refine(row_indices):
+                return list(compress(row_indices, map(compare, map(col_values.__getitem__, row_indices), repeat(target_val))))
         else:
-            raise Exception(f"Unsupported operator: {op}")
+            test = self._bind_condition(dict(where_clause, value=target_val))
 
+            def build_mask():
+                return map(test, col_values)
 
-    def _apply_filtering(self, rows: list, where_clause: dict) -> list:
-        """Applies the WHERE clause to the list of rows."""
-        if not where_clause:
-            return rows
-        
-        filtered_rows = []
-        for row in rows:
-            if self._evaluate_condition(row, where_clause):
-                filtered_rows.append(row)
-        
-        return filtered_rows
-    
-    def execute_query(self, sql_query: str):
+            def refine(row_indices):
+                return list(compress(row_indices, map(test, map(col_values.__getitem__, row_indices))))
+
+        def count():
+            return sum(build_mask())
+
+        if is_simple and use_index and op in _SORTED_COUNTS and isinstance(target_val, (int, float)):
+            def count():
+                # Range counts on numeric columns bisect a sorted copy of the column,
+                # built on the first COUNT that needs it (NaN values disable it)
+                sorted_values = table['sorted'].get(col, False)
+                if sorted_values is False:
+                    has_nan = any(map(operator.ne, col_values, col_values))
+                    sorted_values = table['sorted'][col] = None if has_nan else sorted(col_values)
+                if sorted_values is None:
+                    return sum(build_mask())
+                return _SORTED_COUNTS[op](sorted_values, target_val)
+
+        if not (is_simple and use_index and op in ('=', '!=')):
+            return build_mask, refine, None, count
+
+        # Equality is answered from a hash index, built on first use and kept with the table.
+        # '!=' keeps most rows, so it never builds an index (a scan is as fast), but
+        # reuses one an earlier '=' built
+        index = table['indexes'].get(col)
+        if index is None:
+            if op == '!=':
+                return build_mask, refine, None, count
+            index = table['indexes'][col] = self._build_index(col_values)
+        ids = index.get(target_val, [])
+
+        if op == '=':
+            return build_mask, refine, ids.copy, lambda: len(ids)
+
+        nrows = table['nrows']
+
+        def row_ids():
+            # The complement is only built when rows are asked for, never for COUNT
+            keep = bytearray(b'\x01') * nrows
+            for i in ids:
+                keep[i] = 0
+            return list(compress(range(nrows), keep))
+
+        return build_mask, refine, row_ids, lambda: nrows - len(ids)
+
+    def _compile_filter(self, table: dict, predicates: list) -> tuple:
+        """Compiles the AND-ed WHERE conditions and returns (count_rows, matching_rows).
+        Conditions are ordered by estimated selectivity; the first one scans the column
+        (or reads its hash index) and each later one only checks the rows still left,
+        stopping early once none remain. A single condition is counted without
+        collecting row indices.
         """
-        Main method to parse and execute a SQL query.
-        Returns a list of dictionaries (result rows).
+        predicates = sorted(predicates, key=lambda p: _SELECTIVITY[p['operator']])
+        compiled = [self._compile_predicate(table, p, use_index=(i == 0)) for i, p in enumerate(predicates)]
+        first_mask, _, first_ids, first_count = compiled[0]
+        refiners = [refine for _, refine, _, _ in compiled[1:]]
+        nrows = table['nrows']
+
+        def matching_rows():
+            row_indices = first_ids() if first_ids is not None else list(compress(range(nrows), first_mask()))
+            for refine in refiners:
+                if not row_indices:
+                    break
+                row_indices = refine(row_indices)
+            return row_indices
+
+        if refiners:
+            return (lambda: len(matching_rows())), matching_rows
+        return first_count, matching_rows
+
+    def _compile_query(self, tokens: tuple):
         """
-        parsed_q = self.parse_query(sql_query)
-        table_name = parsed_q['table'] 
-        table_data = self.table_data[table_name]
-        
-        # 1. Start with all rows from the table
-        current_rows = table_data['rows']
-        
-        # 2. Apply Filtering (WHERE)
-        current_rows = self._apply_filtering(current_rows, parsed_q['where'])
+        Parses a query once and returns (table_name, executor), where the executor
+        is a closure with the table, columns and WHERE comparisons already bound.
+        Calling it runs the query.
+        """
+        parsed_q = self._parse_tokens(tokens)
+        table_data = self.table_data[parsed_q['table']]
+        nrows = table_data['nrows']
+        where_clause = parsed_q['where']
+        if where_clause:
+            count_rows, matching_rows = self._compile_filter(table_data, where_clause)
+        else:
+            count_rows, matching_rows = None, None
         
-        # 3. Handle Aggregation (COUNT)
+        # 1. Handle Aggregation (COUNT) straight from the WHERE mask
+        #    where possible, without collecting the matching row indices
         if parsed_q['is_aggregate']:
             func_details = parsed_q['select_cols']
             func = func_details['func']
             target = func_details['target']
             
             if func == 'COUNT':
-                if target == '*':
-                    count_result = len(current_rows)
+                if target != '*' and target not in table_data['columns']:
+                    raise Exception(f"Query Error: Column '{target}' in COUNT() does not exist.")
+
+                if target != '*' and table_data['has_nulls'][target]:
+                    col_values = table_data['rows'][target]
+
+                    def run_count():
+                        values = col_values
+                        if matching_rows:
+                            values = list(map(col_values.__getitem__, matching_rows()))
+                        present = map(operator.and_,
+                                      map(operator.ne, values, repeat('')),
+                                      map(operator.is_not, values, repeat(None)))
+                        return _count_result(sum(present))
+                elif count_rows:
+                    def run_count():
+                        return _count_result(count_rows())
                 else:
-                    if target not in table_data['columns']:
-                        raise Exception(f"Query Error: Column '{target}' in COUNT() does not exist.")
-                        
-                    count_result = sum(1 for row in current_rows if row.get(target) is not None and row.get(target) != '')
+                    def run_count():
+                        return _count_result(nrows)
                     
-                return [{'COUNT': count_result}]
+                return parsed_q['table'], run_count
 
-        # 4. Handle Projection (SELECT)
+        # 2. Handle Projection (SELECT)
         select_cols = parsed_q['select_cols']
-        result_rows = []
         
         if select_cols == ['*']:
-            result_rows = current_rows
+            select_cols = table_data['columns']
         else:
             for col in select_cols:
                 if col not in table_data['columns']:
                     raise Exception(f"Query Error: Column '{col}' in SELECT clause does not exist.")
-
-            for row in current_rows:
-                # Create a new dictionary containing only the selected columns
-                new_row = {col: row.get(col) for col in select_cols}
-                result_rows.append(new_row)
         
-        return result_rows
\ No newline at end of file
+        selected_values = [table_data['rows'][col] for col in select_cols]
+
+        def run_select():
+            # Apply Filtering (WHERE) to get the indices of the surviving rows
+            row_indices = matching_rows() if matching_rows else range(nrows)
+
+            # Slice only the selected columns; rows are never materialized
+            if matching_rows:
+                data = {col: list(map(values.__getitem__, row_indices))
+                        for col, values in zip(select_cols, selected_values)}
+            else:
+                data = {col: values[:] for col, values in zip(select_cols, selected_values)}
+            return {'columns': list(select_cols), 'data': data, 'nrows': len(row_indices)}
+
+        return parsed_q['table'], run_select
+    
+    def _drop_cached_result(self, cache_key: tuple):
+        """Removes one entry from the result cache and releases its cells."""
+        result = self._result_cache.pop(cache_key)[2]
+        self._result_cache_cells -= result['nrows'] * len(result['columns'])
+
+    def execute_query(self, sql_query: str):
+        """
+        Main method to parse and execute a SQL query.
+        Returns a columnar result: { 'columns': [...], 'data': {'col': [...]}, 'nrows': k }
+        (see result_to_rows for a list of row dictionaries).
+        Repeated query text reuses the executor compiled on first use, and
+        returns a copy of the cached result while its table has not been reloaded.
+        Results larger than the cache's cell budget are not cached.
+        """
+        # Tokens ignore whitespace, so they double as the cache key
+        cache_key = _tokenize(sql_query)
+
+        cached = self._result_cache.get(cache_key)
+        if cached is not None and self._table_version.get(cached[0]) == cached[1]:
+            self._result_cache.move_to_end(cache_key)
+            return _copy_result(cached[2])
+
+        table_name, executor = self._compile(cache_key)
+        result = executor()
+
+        cells = result['nrows'] * len(result['columns'])
+        if cells > self._result_cache_max_cells:
+            return result
+
+        if cached is not None:
+            self._drop_cached_result(cache_key)
+        self._result_cache[cache_key] = (table_name, self._table_version.get(table_name), result)
+        self._result_cache_cells += cells
+        while (len(self._result_cache) > self._result_cache_size
+               or self._result_cache_cells > self._result_cache_max_cells):
+            self._drop_cached_result(next(iter(self._result_cache)))
+        return _copy_result(result)
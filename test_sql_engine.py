@@ -0,0 +1,264 @@
+# test_sql_engine.py
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import sql_engine
+from sql_engine import SimpleSQLEngine, result_to_rows
+
+
+class SQLEngineTestCase(unittest.TestCase):
+    """Loads small CSV fixtures written to a temporary directory."""
+
+    def setUp(self):
+        self.engine = SimpleSQLEngine()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def load(self, table_name: str, text: str, engine: SimpleSQLEngine = None):
+        path = os.path.join(self.tmpdir.name, f"{table_name}.csv")
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            f.write(text)
+        with contextlib.redirect_stdout(io.StringIO()):
+            (engine or self.engine).load_csv(path, table_name)
+        return path
+
+    def column(self, sql_query: str, col: str) -> list:
+        return self.engine.execute_query(sql_query)['data'][col]
+
+
+class TestNumericComparisons(SQLEngineTestCase):
+
+    def test_blank_cells_do_not_change_numeric_comparisons(self):
+        # 'with_blank' goes through the per-row fallback, 'no_blank' through the column scan
+        self.load('with_blank', "id,price\n1,30.5\n2,31\n3,\n4,30\n")
+        self.load('no_blank', "id,price\n1,30.5\n2,31\n4,30\n")
+
+        for op in ('=', '!=', '>', '<', '>=', '<='):
+            for literal in ('30', '30.5', '31', "'30'", "'30.5'"):
+                condition = f"price {op} {literal}"
+                with_blank = self.column(f"SELECT price FROM with_blank WHERE {condition}", 'price')
+                no_blank = self.column(f"SELECT price FROM no_blank WHERE {condition}", 'price')
+                with self.subTest(condition=condition):
+                    self.assertEqual([v for v in with_blank if v != ''], no_blank)
+
+        self.assertEqual(self.column("SELECT price FROM with_blank WHERE price > 30", 'price'), [30.5, 31])
+
+
+class TestResultCache(SQLEngineTestCase):
+
+    def test_modifying_a_result_does_not_change_later_results(self):
+        self.load('t', "id\n1\n2\n")
+        query = "SELECT id FROM t"
+
+        first = self.engine.execute_query(query)
+        first['data']['id'].append(99)
+        first['columns'].append('extra')
+
+        second = self.engine.execute_query(query)
+        second['data']['id'].sort(reverse=True)
+
+        self.assertEqual(self.engine.execute_query(query),
+                         {'columns': ['id'], 'data': {'id': [1, 2]}, 'nrows': 2})
+
+    def test_reload_invalidates_cached_results(self):
+        self.load('t', "id\n1\n2\n")
+        self.assertEqual(self.column("SELECT id FROM t WHERE id > 1", 'id'), [2])
+
+        self.load('t', "id\n3\n4\n")
+        self.assertEqual(self.engine._result_cache_cells, 0)
+        self.assertEqual(self.column("SELECT id FROM t WHERE id > 1", 'id'), [3, 4])
+
+    def test_cached_cells_are_capped(self):
+        self.load('t', "id,name\n1,a\n2,b\n3,c\n")
+        self.engine._result_cache_max_cells = 4
+
+        # 6 cells: too large to cache at all
+        self.engine.execute_query("SELECT * FROM t")
+        self.assertEqual(len(self.engine._result_cache), 0)
+
+        # 3 + 2 cells: the older entry is evicted to stay within 4
+        self.engine.execute_query("SELECT id FROM t")
+        self.engine.execute_query("SELECT name FROM t WHERE id >= 2")
+        self.assertEqual(list(self.engine._result_cache), [sql_engine._tokenize("SELECT name FROM t WHERE id >= 2")])
+        self.assertEqual(self.engine._result_cache_cells, 2)
+
+
+class TestAndConditions(SQLEngineTestCase):
+
+    CSV = ("id,dept,age,score\n"
+           "1,Sales,34,7.5\n2,sales,28,\n3,HR,41,9\n4,Sales,30,6\n5,IT,,8.5\n"
+           "6,IT,52,7.5\n7,HR,30,\n8,Sales,45,9\n9,it,39,5\n10,HR,25,8\n")
+    CONDITIONS = ["dept = 'Sales'", "dept != 'hr'", "age > 30", "age <= 39", "age = 30", "age != 34",
+                  "score >= 7.5", "score < 9", "score = 9", "id >= 3", "id != 8"]
+
+    def setUp(self):
+        super().setUp()
+        self.load('t', self.CSV)
+
+    def ids(self, where: str) -> list:
+        return self.column(f"SELECT id FROM t WHERE {where}", 'id')
+
+    def test_and_matches_intersection_of_single_conditions(self):
+        single = {cond: self.ids(cond) for cond in self.CONDITIONS}
+        # '=' conditions run first from a hash index; every other pairing goes
+        # through the refine path, on clean and on blank-containing columns
+        for a in self.CONDITIONS:
+            for b in self.CONDITIONS:
+                where = f"{a} AND {b}"
+                expected = [i for i in single[a] if i in single[b]]
+                with self.subTest(where=where):
+                    self.assertEqual(self.ids(where), expected)
+                    self.assertEqual(self.column(f"SELECT COUNT(*) FROM t WHERE {where}", 'COUNT'),
+                                     [len(expected)])
+
+        self.assertEqual(self.ids("dept != 'hr' AND age > 30 AND score >= 7.5 AND id != 8"), [1, 6])
+
+    def spy_on_predicates(self) -> list:
+        """Records ('compile', column) and ('refine', column) as the WHERE conditions run."""
+        calls = []
+        compile_predicate = self.engine._compile_predicate
+
+        def spy(table, where_clause, use_index=True):
+            build_mask, refine, row_ids, count = compile_predicate(table, where_clause, use_index)
+            calls.append(('compile', where_clause['column']))
+
+            def recorded_refine(row_indices):
+                calls.append(('refine', where_clause['column']))
+                return refine(row_indices)
+
+            return build_mask, recorded_refine, row_ids, count
+
+        patcher = mock.patch.object(self.engine, '_compile_predicate', side_effect=spy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return calls
+
+    def test_most_selective_condition_runs_first(self):
+        calls = self.spy_on_predicates()
+        self.assertEqual(self.ids("id != 8 AND age > 30 AND dept = 'IT'"), [6, 9])
+        self.assertEqual(calls, [('compile', 'dept'), ('compile', 'age'), ('compile', 'id'),
+                                 ('refine', 'age'), ('refine', 'id')])
+
+    def test_later_conditions_are_skipped_once_no_rows_are_left(self):
+        calls = self.spy_on_predicates()
+        self.assertEqual(self.ids("age > 30 AND dept = 'Marketing' AND score < 9"), [])
+        self.assertNotIn(('refine', 'score'), calls)
+        self.assertEqual(self.column("SELECT COUNT(*) FROM t WHERE dept = 'nobody' AND age > 1", 'COUNT'), [0])
+        self.assertNotIn(('refine', 'age'), calls)
+
+    def test_or_is_a_syntax_error(self):
+        with self.assertRaisesRegex(Exception, "Unexpected 'OR' in query"):
+            self.engine.execute_query("SELECT id FROM t WHERE age > 30 OR dept = 'HR'")
+
+
+class TestRangeCounts(SQLEngineTestCase):
+
+    def assert_counts_match_selects(self, table_name: str, col: str, literals: tuple):
+        for op in ('>', '>=', '<', '<='):
+            for literal in literals:
+                where = f"{col} {op} {literal}"
+                rows = self.engine.execute_query(f"SELECT {col} FROM {table_name} WHERE {where}")['nrows']
+                with self.subTest(table=table_name, where=where):
+                    self.assertEqual(self.column(f"SELECT COUNT(*) FROM {table_name} WHERE {where}", 'COUNT'),
+                                     [rows])
+
+    def test_counts_from_sorted_copy_match_selected_rows(self):
+        self.load('t', "id,price\n1,3.5\n2,1\n3,3.5\n4,-2\n5,10\n6,3.5\n")
+        self.assert_counts_match_selects('t', 'id', (0, 1, 3, 6, 7))
+        self.assert_counts_match_selects('t', 'price', (-3, -2, 1, 3.5, '3.5', 4, 10, 11))
+        self.assertEqual(self.engine.table_data['t']['sorted']['price'], [-2, 1, 3.5, 3.5, 3.5, 10])
+
+    def test_nan_column_disables_sorted_copy(self):
+        self.load('t', "id,price\n1,3.5\n2,nan\n3,1\n4,7\n")
+        self.assert_counts_match_selects('t', 'price', (0, 1, 3.5, 7, 8))
+        self.assertIsNone(self.engine.table_data['t']['sorted']['price'])
+
+    def test_column_with_blanks_counts_by_scanning(self):
+        self.load('t', "id,price\n1,3.5\n2,\n3,1\n4,7\n")
+        self.assert_counts_match_selects('t', 'price', (0, 1, 3.5, 7, 8))
+        self.assertEqual(self.engine.table_data['t']['sorted'], {})
+
+
+class TestIndexedConditions(SQLEngineTestCase):
+
+    def count(self, sql_query: str) -> int:
+        return self.column(sql_query, 'COUNT')[0]
+
+    def test_not_equal_does_not_build_an_index(self):
+        self.load('t', "id,dept\n1,a\n2,b\n3,a\n4,c\n")
+
+        self.assertEqual(self.count("SELECT COUNT(*) FROM t WHERE dept != 'a'"), 2)
+        self.assertEqual(self.engine.table_data['t']['indexes'], {})
+
+        # Once '=' has built the index, '!=' reuses it for both counts and rows
+        self.assertEqual(self.count("SELECT COUNT(*) FROM t WHERE dept = 'a'"), 2)
+        self.assertIn('dept', self.engine.table_data['t']['indexes'])
+        self.assertEqual(self.count("SELECT COUNT(*) FROM t WHERE dept != 'b'"), 3)
+        self.assertEqual(self.column("SELECT id FROM t WHERE dept != 'b'", 'id'), [1, 3, 4])
+
+    def test_reload_drops_indexes_and_sorted_copies(self):
+        queries = ["SELECT COUNT(*) FROM t WHERE id = 2", "SELECT COUNT(*) FROM t WHERE id != 2",
+                   "SELECT COUNT(*) FROM t WHERE id > 1", "SELECT COUNT(*) FROM t WHERE id <= 2"]
+        self.load('t', "id\n1\n2\n3\n")
+        self.assertEqual([self.count(q) for q in queries], [1, 2, 2, 2])
+        self.assertEqual(self.column("SELECT id FROM t WHERE id != 2", 'id'), [1, 3])
+
+        self.load('t', "id\n2\n2\n5\n6\n7\n")
+        self.assertEqual([self.count(q) for q in queries], [2, 3, 5, 2])
+        self.assertEqual(self.column("SELECT id FROM t WHERE id != 2", 'id'), [5, 6, 7])
+
+
+class TestKeywordNamedColumns(SQLEngineTestCase):
+
+    def test_columns_may_be_named_after_keywords(self):
+        self.load('k', "id,count,as,or\n1,3,x,p\n2,7,y,q\n3,9,z,r\n")
+
+        self.assertEqual(self.column("SELECT count FROM k", 'count'), [3, 7, 9])
+        self.assertEqual(self.column("SELECT as FROM k WHERE count > 5", 'as'), ['y', 'z'])
+        self.assertEqual(self.column("select id, or from k where or = 'q' and count >= 7", 'id'), [2])
+        self.assertEqual(self.column("SELECT COUNT(count) FROM k WHERE as != 'x'", 'COUNT'), [2])
+        self.assertEqual(self.column("SELECT COUNT(*) FROM k WHERE count > 5", 'COUNT'), [2])
+
+
+class TestParallelLoad(SQLEngineTestCase):
+
+    CASES = {
+        'quoted_multiline': 'id,note\n' + ''.join(f'{i},"line one\nline ""two"""\n' for i in range(20)),
+        'crlf': 'id,note\r\n' + ''.join(f'{i},"a,b"\r\n{i},\r\n' for i in range(20)),
+        'ragged': 'id,a,b\n' + ''.join(f'{i},x\n{i},x,y,z\n' for i in range(20)),
+        'stray_quote': 'id,note\n1,5" screen\n2,plain\n3,"multi\nline"\n4,x\n5,y\n6,z\n7,w\n8,v\n',
+        'text_after_closing_quote': 'id,note\n' + ''.join(f'{i},"ab"c\n{i},"x\ny"\n' for i in range(10)),
+        'quoted_header': '"id","note"\n' + ''.join(f'{i},"q{i}"\n' for i in range(20)),
+    }
+
+    def load_both_ways(self, name: str, text: str):
+        serial = SimpleSQLEngine()
+        self.load(name, text, serial)
+        parallel = SimpleSQLEngine()
+        with mock.patch.object(sql_engine, '_PARALLEL_LOAD_MIN_BYTES', 1), \
+                mock.patch.object(sql_engine.os, 'cpu_count', return_value=4):
+            path = self.load(name, text, parallel)
+            used_parallel = parallel._read_csv_parallel(path) is not None
+        return serial.table_data[name], parallel.table_data[name], used_parallel
+
+    def test_parallel_load_matches_serial_load(self):
+        for name, text in self.CASES.items():
+            serial, parallel, _ = self.load_both_ways(name, text)
+            with self.subTest(case=name):
+                self.assertEqual(parallel, serial)
+
+    def test_quotes_inside_unquoted_fields_fall_back_to_serial(self):
+        for name in ('stray_quote', 'text_after_closing_quote'):
+            with self.subTest(case=name):
+                self.assertFalse(self.load_both_ways(name, self.CASES[name])[2])
+        for name in ('quoted_multiline', 'crlf', 'ragged', 'quoted_header'):
+            with self.subTest(case=name):
+                self.assertTrue(self.load_both_ways(name, self.CASES[name])[2])
+
+
+if __name__ == '__main__':
+    unittest.main()